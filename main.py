@@ -1,17 +1,23 @@
 import os
-import json
-from typing import Dict, Any, AsyncGenerator
+import time
+import hashlib
+import orjson
+import numpy as np
+import pandas as pd
+from contextlib import aclosing
+from typing import Dict, Any, AsyncGenerator, Optional, Tuple
 from fastapi import FastAPI, Query, HTTPException, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_mcp import FastApiMCP
-from pydantic import BaseModel
+from sse_starlette.sse import EventSourceResponse
 from dotenv import load_dotenv
-from datetime import datetime
 
 # 导入服务
 from services.stock_analyzer_service import StockAnalyzerService
+from services.stock_cache import LATEST_COLUMNS
 from utils.logger import get_logger
+from utils.date_utils import today_str
 
 # 加载环境变量
 load_dotenv()
@@ -22,7 +28,8 @@ logger = get_logger()
 # 创建FastAPI应用
 app = FastAPI(
     title="股票分析MCP服务",
-    description="基于FastAPI-MCP的股票分析服务，提供股票数据、技术分析和AI分析功能"
+    description="基于FastAPI-MCP的股票分析服务，提供股票数据、技术分析和AI分析功能",
+    default_response_class=ORJSONResponse
 )
 
 # 添加CORS中间件
@@ -37,10 +44,87 @@ app.add_middleware(
 # 创建股票分析服务实例
 analyzer = StockAnalyzerService()
 
-# 定义请求模型
-class StockAnalysisRequest(BaseModel):
-    stock_code: str
-    market_type: str = "A"
+@app.on_event("startup")
+async def _startup():
+    """预热指标计算、数据源模块和HTTP客户端"""
+    await analyzer.warmup()
+
+@app.on_event("shutdown")
+async def _shutdown():
+    """关闭共享的HTTP客户端和数据获取线程池"""
+    await analyzer.aclose()
+
+def _ndjson_line(payload: Dict[str, Any]) -> bytes:
+    """将字典序列化为一行NDJSON（bytes），numpy标量由orjson直接处理"""
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+
+def _json_response(payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Response:
+    """直接返回orjson序列化后的JSON响应，跳过FastAPI的jsonable_encoder和响应模型校验"""
+    return Response(content=orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY), media_type="application/json", headers=headers)
+
+# 流式响应合批发送：距上次发送超过该间隔（秒）或缓冲区超过该大小（字节）时发送，只按整行NDJSON发送
+_STREAM_FLUSH_INTERVAL = 0.05
+_STREAM_FLUSH_SIZE = 8192
+
+# 信号标签查找表，下标 = 1 + 大于阈值 - 小于阈值
+_MA_TREND = ("DOWN", "FLAT", "UP")
+_MACD_SIGNAL = ("SELL", "HOLD", "BUY")
+_VOLUME_STATUS = ("LOW", "NORMAL", "HIGH")
+
+# LATEST_COLUMNS中各列的下标
+_COL_IDX = {name: i for i, name in enumerate(LATEST_COLUMNS)}
+# 比较对 (MA5 vs MA20, MA20 vs MA60, MACD vs Signal, Volume vs Volume_MA) 及上下阈值倍数
+_CMP_LHS = np.array([_COL_IDX['MA5'], _COL_IDX['MA20'], _COL_IDX['MACD'], _COL_IDX['Volume']])
+_CMP_RHS = np.array([_COL_IDX['MA20'], _COL_IDX['MA60'], _COL_IDX['Signal'], _COL_IDX['Volume_MA']])
+_CMP_UPPER = np.array([1.0, 1.0, 1.0, 1.5])
+_CMP_LOWER = np.array([1.0, 1.0, 1.0, 0.5])
+
+def _classify_signals(last: np.ndarray) -> Tuple[str, str, str]:
+    """
+    根据最新一行指标判定均线趋势、MACD信号和成交量状态
+
+    Args:
+        last: 按LATEST_COLUMNS排列的最新一行指标数组
+
+    Returns:
+        (ma_trend, macd_signal, volume_status)的元组；指标为NaN时比较结果为False，落入FLAT/HOLD/NORMAL
+    """
+    lhs = last[_CMP_LHS]
+    rhs = last[_CMP_RHS]
+    above = (lhs > rhs * _CMP_UPPER).tolist()
+    below = (lhs < rhs * _CMP_LOWER).tolist()
+    return (
+        _MA_TREND[1 + (above[0] and above[1]) - (below[0] and below[1])],
+        _MACD_SIGNAL[1 + above[2] - below[2]],
+        _VOLUME_STATUS[1 + above[3] - below[3]],
+    )
+
+def _make_etag(request: Request, stock_code: str, market_type: str, df: pd.DataFrame, rows: np.ndarray) -> str:
+    """
+    根据接口路径、请求参数和最新K线生成ETag，最新K线更新（含盘中价格、成交量变化）后ETag随之变化
+
+    Args:
+        request: 当前请求
+        stock_code: 请求中的股票代码（响应中原样返回，因此参与计算）
+        market_type: 市场类型
+        df: 含技术指标的DataFrame
+        rows: get_latest_rows返回的最新两行指标数组
+
+    Returns:
+        带双引号的强ETag
+    """
+    digest = hashlib.blake2b(f"{request.url.path}|{stock_code}|{market_type}|{df.index[-1]}".encode(), digest_size=8)
+    digest.update(rows[-1].tobytes())
+    return f'"{digest.hexdigest()}"'
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """判断请求头If-None-Match是否与ETag匹配"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
 
 # 定义API端点
 @app.get(
@@ -51,111 +135,101 @@ class StockAnalysisRequest(BaseModel):
 )
 async def analyze_stock(
     stock_code: str = Query(..., description="股票代码，如'600795'"),
-    market_type: str = Query("A", description="市场类型，默认为'A'股，可选值：A(A股)、HK(港股)、US(美股)、ETF(场内ETF)、LOF(场内LOF)")
-) -> StreamingResponse:
+    market_type: str = Query("A", description="市场类型，默认为'A'股，可选值：A(A股)、HK(港股)、US(美股)、ETF(场内ETF)、LOF(场内LOF)"),
+    stream_format: str = Query("sse", description="流式响应格式，默认为'sse'(Server-Sent Events)，可选值：sse、ndjson(兼容旧版客户端)")
+) -> Response:
     """
     分析单只股票（流式API）
     
     Args:
         stock_code: 股票代码
         market_type: 市场类型，默认为'A'股
+        stream_format: 流式响应格式，默认为'sse'，'ndjson'为兼容旧版的逐行JSON
     
     Returns:
         以流式响应返回股票分析结果
     """
-    logger.info(f"API调用 (流式): analyze_stock({stock_code}, {market_type})")
+    logger.info(f"API调用 (流式): analyze_stock({stock_code}, {market_type}, {stream_format})")
 
-    async def stream_generator() -> AsyncGenerator[str, None]:
+    async def stream_generator() -> AsyncGenerator[bytes, None]:
         """异步生成器，用于流式传输分析结果"""
+        buffer = bytearray()
+        # 初始为0，使AI分析首帧到达时立即与基本分析结果合并发送
+        last_flush = 0.0
         try:
-            # 1. 获取股票数据 (直接调用 data_provider)
-            cleaned_stock_code = stock_code
-            if market_type == 'A': # 仅对A股进行前缀清理
-                if stock_code.lower().startswith('sh') or stock_code.lower().startswith('sz'):
-                    cleaned_stock_code = stock_code[2:]
-                    logger.debug(f"股票代码 {stock_code} 已清理为 {cleaned_stock_code}")
-            df = await analyzer.data_provider.get_stock_data(cleaned_stock_code, market_type)
-
-            # 3. 检查数据错误
-            if hasattr(df, 'error'):
-                error_msg = df.error
-                logger.error(f"获取股票数据时出错: {error_msg}")
-                yield json.dumps({"error": error_msg, "stock_code": cleaned_stock_code, "status": "error"}) + '\n'
-                return
-
-            if df.empty:
-                error_msg = f"获取到的股票 {cleaned_stock_code} 数据为空"
-                logger.error(error_msg)
-                yield json.dumps({"error": error_msg, "stock_code": cleaned_stock_code, "status": "error"}) + '\n'
-                return
-
-            # 4. 计算技术指标 (直接调用 indicator)
-            df_with_indicators = analyzer.indicator.calculate_indicators(df)
-
-            # 5. 计算评分 (直接调用 scorer)
+            # 1. 获取含技术指标的股票数据 (清理代码、优先使用缓存并校验)
+            cleaned_stock_code, df_with_indicators = await analyzer.load_stock_df(stock_code, market_type)
+
+            # 2. 计算评分 (直接调用 scorer)
             score = analyzer.scorer.calculate_score(df_with_indicators)
             recommendation = analyzer.scorer.get_recommendation(score)
 
-            # 6. 准备基本分析结果
-            latest_data = df_with_indicators.iloc[-1]
-            previous_data = df_with_indicators.iloc[-2] if len(df_with_indicators) > 1 else latest_data
-            price_change_value = latest_data['Close'] - previous_data['Close']
-            change_percent = latest_data.get('Change_pct')
-            if change_percent is None and previous_data['Close'] != 0:
-                change_percent = (price_change_value / previous_data['Close']) * 100
-
-            ma_short = latest_data.get('MA5', 0)
-            ma_medium = latest_data.get('MA20', 0)
-            ma_long = latest_data.get('MA60', 0)
-            if ma_short > ma_medium > ma_long: ma_trend = "UP"
-            elif ma_short < ma_medium < ma_long: ma_trend = "DOWN"
-            else: ma_trend = "FLAT"
-
-            macd = latest_data.get('MACD', 0)
-            signal = latest_data.get('Signal', 0)
-            if macd > signal: macd_signal = "BUY"
-            elif macd < signal: macd_signal = "SELL"
-            else: macd_signal = "HOLD"
-
-            volume = latest_data.get('Volume', 0)
-            volume_ma = latest_data.get('Volume_MA', 0)
-            if volume > volume_ma * 1.5: volume_status = "HIGH"
-            elif volume < volume_ma * 0.5: volume_status = "LOW"
-            else: volume_status = "NORMAL"
+            # 3. 准备基本分析结果
+            # 最新两行指标数组随DataFrame缓存，判定逻辑均在数组上完成
+            rows = analyzer.cache.get_latest_rows(cleaned_stock_code, market_type, df_with_indicators)
+            prev, last = rows
+            price_change_value = last[_COL_IDX['Close']] - prev[_COL_IDX['Close']]
+            change_percent = last[_COL_IDX['Change_pct']]
+            # 如果原始数据中没有涨跌幅，才进行计算
+            if np.isnan(change_percent):
+                change_percent = (price_change_value / prev[_COL_IDX['Close']]) * 100 if prev[_COL_IDX['Close']] != 0 else None
+
+            ma_trend, macd_signal, volume_status = _classify_signals(last)
 
             basic_result = {
                 "stock_code": stock_code,
                 "market_type": market_type,
-                "analysis_date": datetime.now().strftime('%Y-%m-%d'),
+                "analysis_date": today_str(),
                 "score": score,
-                "price": latest_data['Close'],
-                "price_change_value": price_change_value,
-                "change_percent": change_percent,
+                "price": float(last[_COL_IDX['Close']]),
+                "price_change_value": float(price_change_value),
+                "change_percent": float(change_percent) if change_percent is not None else None,
                 "ma_trend": ma_trend,
-                "rsi": latest_data.get('RSI', 0),
+                "rsi": float(last[_COL_IDX['RSI']]),
                 "macd_signal": macd_signal,
                 "volume_status": volume_status,
                 "recommendation": recommendation,
                 "ai_analysis": ""
             }
             
-            # 7. Yield 基本分析结果
-            yield json.dumps(basic_result) + '\n'
-
-            # 8. 调用AI分析 (直接调用 ai_analyzer)
-            async for analysis_chunk in analyzer.ai_analyzer.get_ai_analysis(df_with_indicators, cleaned_stock_code, market_type, stream=True):
-                yield analysis_chunk + '\n'
-
+            # 4. 基本分析结果写入缓冲区，与AI分析首帧合并发送
+            buffer += _ndjson_line(basic_result)
+
+            # 5. 调用AI分析 (直接调用 ai_analyzer)，小块内容按时间/大小合批发送，减少ASGI send次数
+            # aclosing保证客户端断开时及时关闭AI生成器及其上游HTTP流
+            async with aclosing(analyzer.ai_analyzer.get_ai_analysis(df_with_indicators, cleaned_stock_code, market_type, stream=True)) as ai_stream:
+                async for analysis_chunk in ai_stream:
+                    buffer += _ndjson_line(analysis_chunk)
+                    now = time.monotonic()
+                    if now - last_flush >= _STREAM_FLUSH_INTERVAL or len(buffer) >= _STREAM_FLUSH_SIZE:
+                        yield bytes(buffer)
+                        buffer.clear()
+                        last_flush = now
+
+        except HTTPException as he:
+            buffer += _ndjson_line({"error": he.detail, "stock_code": stock_code, "status": "error"})
         except KeyError as ke:
             error_msg = f"股票代码 {stock_code} 在数据源中不存在或格式不正确: {str(ke)}"
             logger.error(f"分析股票时出错: {error_msg}")
-            yield json.dumps({"error": error_msg, "stock_code": stock_code, "status": "error"}) + '\n'
+            buffer += _ndjson_line({"error": error_msg, "stock_code": stock_code, "status": "error"})
         except Exception as e:
             logger.error(f"分析股票时出错: {str(e)}")
-            error_message = json.dumps({"error": str(e)})
-            yield f"{error_message}\n"
+            buffer += _ndjson_line({"error": str(e)})
 
-    return StreamingResponse(stream_generator(), media_type="application/x-ndjson")
+        # 发送缓冲区中剩余的内容
+        if buffer:
+            yield bytes(buffer)
+
+    if stream_format == 'ndjson':
+        return StreamingResponse(stream_generator(), media_type="application/x-ndjson")
+
+    async def sse_generator() -> AsyncGenerator[Dict[str, str], None]:
+        """将合批后的NDJSON行作为一个SSE事件发送，事件数据内每行一个JSON对象"""
+        async for batch in stream_generator():
+            yield {"data": batch.rstrip(b'\n').decode()}
+
+    # 长时间的AI流由EventSourceResponse定时发送ping保活，X-Accel-Buffering禁用nginx缓冲
+    return EventSourceResponse(sse_generator(), headers={"X-Accel-Buffering": "no"})
 
 @app.get(
     "/stock_price", 
@@ -164,9 +238,10 @@ async def analyze_stock(
     description="获取指定股票的最新价格、涨跌幅等基本价格信息"
 )
 async def get_stock_price(
+    request: Request,
     stock_code: str = Query(..., description="股票代码，如'600795'"),
     market_type: str = Query("A", description="市场类型，默认为'A'股，可选值：A(A股)、HK(港股)、US(美股)、ETF(场内ETF)、LOF(场内LOF)")
-) -> Dict[str, Any]:
+) -> Response:
     """
     获取股票价格信息
     
@@ -180,49 +255,23 @@ async def get_stock_price(
     try:
         logger.info(f"API调用: get_stock_price({stock_code}, {market_type})")
         
-        cleaned_stock_code = stock_code
-        if market_type == 'A': # 仅对A股进行前缀清理
-            if stock_code.lower().startswith('sh') or stock_code.lower().startswith('sz'):
-                cleaned_stock_code = stock_code[2:]
-                logger.debug(f"股票代码 {stock_code} 已清理为 {cleaned_stock_code}")
-
-        # 获取股票数据
-        df = await analyzer.data_provider.get_stock_data(cleaned_stock_code, market_type)
-        
-        # 检查是否有错误
-        if hasattr(df, 'error'):
-            raise HTTPException(status_code=400, detail=df.error)
-        
-        # 检查数据是否为空
-        if df.empty:
-            raise HTTPException(status_code=404, detail=f"获取到的股票 {cleaned_stock_code} 数据为空")
+        # 获取含技术指标的股票数据 (清理代码、优先使用缓存并校验)
+        cleaned_stock_code, df = await analyzer.load_stock_df(stock_code, market_type)
+        rows = analyzer.cache.get_latest_rows(cleaned_stock_code, market_type, df)
+
+        # 数据未更新时返回304，省去计算和响应体传输
+        etag = _make_etag(request, stock_code, market_type, df, rows)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
         
-        # 获取最新数据
-        latest_data = df.iloc[-1]
-        previous_data = df.iloc[-2] if len(df) > 1 else latest_data
+        # 获取最新价格快照 (与数据一同缓存)
+        price_info = analyzer.cache.get_latest_snapshot(cleaned_stock_code, market_type, df)
         
-        # 价格变动绝对值
-        price_change_value = latest_data['Close'] - previous_data['Close']
-        
-        # 获取涨跌幅
-        change_percent = latest_data.get('Change_pct')
-        
-        # 如果原始数据中没有涨跌幅，才进行计算
-        if change_percent is None and previous_data['Close'] != 0:
-            change_percent = (price_change_value / previous_data['Close']) * 100
-        
-        return {
+        return _json_response({
             "stock_code": stock_code,
             "market_type": market_type,
-            "price": float(latest_data['Close']),
-            "open": float(latest_data['Open']),
-            "high": float(latest_data['High']),
-            "low": float(latest_data['Low']),
-            "volume": float(latest_data['Volume']),
-            "price_change_value": float(price_change_value),
-            "change_percent": float(change_percent) if change_percent is not None else None,
-            "date": latest_data.name.strftime('%Y-%m-%d')
-        }
+            **price_info
+        }, headers={"ETag": etag})
     
     except HTTPException:
         raise
@@ -240,9 +289,10 @@ async def get_stock_price(
     description="获取股票的技术指标分析，包括MA趋势、RSI、MACD信号、布林带等技术指标"
 )
 async def get_technical_analysis(
+    request: Request,
     stock_code: str = Query(..., description="股票代码，如'600795'"),
     market_type: str = Query("A", description="市场类型，默认为'A'股，可选值：A(A股)、HK(港股)、US(美股)、ETF(场内ETF)、LOF(场内LOF)")
-) -> Dict[str, Any]:
+) -> Response:
     """
     获取股票技术分析
     
@@ -256,75 +306,34 @@ async def get_technical_analysis(
     try:
         logger.info(f"API调用: get_technical_analysis({stock_code}, {market_type})")
         
-        cleaned_stock_code = stock_code
-        if market_type == 'A': # 仅对A股进行前缀清理
-            if stock_code.lower().startswith('sh') or stock_code.lower().startswith('sz'):
-                cleaned_stock_code = stock_code[2:]
-                logger.debug(f"股票代码 {stock_code} 已清理为 {cleaned_stock_code}")
-
-        # 获取股票数据
-        df = await analyzer.data_provider.get_stock_data(cleaned_stock_code, market_type)
-        
-        # 检查是否有错误
-        if hasattr(df, 'error'):
-            raise HTTPException(status_code=400, detail=df.error)
-        
-        # 检查数据是否为空
-        if df.empty:
-            raise HTTPException(status_code=404, detail=f"获取到的股票 {cleaned_stock_code} 数据为空")
-        
-        # 计算技术指标
-        df_with_indicators = analyzer.indicator.calculate_indicators(df)
+        # 获取含技术指标的股票数据 (清理代码、优先使用缓存并校验)
+        cleaned_stock_code, df = await analyzer.load_stock_df(stock_code, market_type)
         
-        # 获取最新数据
-        latest_data = df_with_indicators.iloc[-1]
-        
-        # 确定MA趋势
-        ma_short = latest_data.get('MA5', 0)
-        ma_medium = latest_data.get('MA20', 0)
-        ma_long = latest_data.get('MA60', 0)
-        
-        if ma_short > ma_medium > ma_long:
-            ma_trend = "UP"
-        elif ma_short < ma_medium < ma_long:
-            ma_trend = "DOWN"
-        else:
-            ma_trend = "FLAT"
-            
-        # 确定MACD信号
-        macd = latest_data.get('MACD', 0)
-        signal = latest_data.get('Signal', 0)
+        # 获取最新两行指标数组 (随DataFrame缓存)
+        rows = analyzer.cache.get_latest_rows(cleaned_stock_code, market_type, df)
+
+        # 数据未更新时返回304，省去计算和响应体传输
+        etag = _make_etag(request, stock_code, market_type, df, rows)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
         
-        if macd > signal:
-            macd_signal = "BUY"
-        elif macd < signal:
-            macd_signal = "SELL"
-        else:
-            macd_signal = "HOLD"
-            
-        # 确定成交量状态
-        volume = latest_data.get('Volume', 0)
-        volume_ma = latest_data.get('Volume_MA', 0)
+        last = rows[-1]
         
-        if volume > volume_ma * 1.5:
-            volume_status = "HIGH"
-        elif volume < volume_ma * 0.5:
-            volume_status = "LOW"
-        else:
-            volume_status = "NORMAL"
+        # 确定MA趋势、MACD信号和成交量状态
+        ma_trend, macd_signal, volume_status = _classify_signals(last)
         
-        return {
+        return _json_response({
             "stock_code": stock_code,
             "market_type": market_type,
             "ma_trend": ma_trend,
-            "rsi": float(latest_data.get('RSI', 0)),
-            "macd": float(macd),
+            "rsi": float(last[_COL_IDX['RSI']]),
+            "macd": float(last[_COL_IDX['MACD']]),
             "macd_signal": macd_signal,
             "volume_status": volume_status,
-            "bollinger_upper": float(latest_data.get('BB_Upper', 0)),
-            "bollinger_middle": float(latest_data.get('BB_Middle', 0)),
-            "bollinger_lower": float(latest_data.get('BB_Lower', 0))
-        }
+            "bollinger_upper": float(last[_COL_IDX['BB_Upper']]),
+            "bollinger_middle": float(last[_COL_IDX['BB_Middle']]),
+            "bollinger_lower": float(last[_COL_IDX['BB_Lower']])
+        }, headers={"ETag": etag})
     
     except HTTPException:
         raise
@@ -342,9 +351,10 @@ async def get_technical_analysis(
     description="获取股票的综合评分和投资建议"
 )
 async def get_stock_score(
+    request: Request,
     stock_code: str = Query(..., description="股票代码，如'600795'"),
     market_type: str = Query("A", description="市场类型，默认为'A'股，可选值：A(A股)、HK(港股)、US(美股)、ETF(场内ETF)、LOF(场内LOF)")
-) -> Dict[str, Any]:
+) -> Response:
     """
     获取股票评分
     
@@ -358,36 +368,25 @@ async def get_stock_score(
     try:
         logger.info(f"API调用: get_stock_score({stock_code}, {market_type})")
         
-        cleaned_stock_code = stock_code
-        if market_type == 'A': # 仅对A股进行前缀清理
-            if stock_code.lower().startswith('sh') or stock_code.lower().startswith('sz'):
-                cleaned_stock_code = stock_code[2:]
-                logger.debug(f"股票代码 {stock_code} 已清理为 {cleaned_stock_code}")
-
-        # 获取股票数据
-        df = await analyzer.data_provider.get_stock_data(cleaned_stock_code, market_type)
-        
-        # 检查是否有错误
-        if hasattr(df, 'error'):
-            raise HTTPException(status_code=400, detail=df.error)
-        
-        # 检查数据是否为空
-        if df.empty:
-            raise HTTPException(status_code=404, detail=f"获取到的股票 {cleaned_stock_code} 数据为空")
-        
-        # 计算技术指标
-        df_with_indicators = analyzer.indicator.calculate_indicators(df)
+        # 获取含技术指标的股票数据 (清理代码、优先使用缓存并校验)
+        cleaned_stock_code, df = await analyzer.load_stock_df(stock_code, market_type)
+        rows = analyzer.cache.get_latest_rows(cleaned_stock_code, market_type, df)
+
+        # 数据未更新时返回304，省去计算和响应体传输
+        etag = _make_etag(request, stock_code, market_type, df, rows)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
         
         # 计算评分
-        score = analyzer.scorer.calculate_score(df_with_indicators)
+        score = analyzer.scorer.calculate_score(df)
         recommendation = analyzer.scorer.get_recommendation(score)
         
-        return {
+        return _json_response({
             "stock_code": stock_code,
             "market_type": market_type,
             "score": score,
             "recommendation": recommendation
-        }
+        }, headers={"ETag": etag})
     
     except HTTPException:
         raise
@@ -407,7 +406,7 @@ async def get_stock_score(
 async def get_ai_analysis(
     stock_code: str = Query(..., description="股票代码，如'600795'"),
     market_type: str = Query("A", description="市场类型，默认为'A'股，可选值：A(A股)、HK(港股)、US(美股)、ETF(场内ETF)、LOF(场内LOF)")
-) -> Dict[str, Any]:
+) -> Response:
     """
     获取股票AI分析
     
@@ -421,56 +420,20 @@ async def get_ai_analysis(
     try:
         logger.info(f"API调用: get_ai_analysis({stock_code}, {market_type})")
         
-        cleaned_stock_code = stock_code
-        if market_type == 'A': # 仅对A股进行前缀清理
-            if stock_code.lower().startswith('sh') or stock_code.lower().startswith('sz'):
-                cleaned_stock_code = stock_code[2:]
-                logger.debug(f"股票代码 {stock_code} 已清理为 {cleaned_stock_code}")
-
-        # 获取股票数据
-        df = await analyzer.data_provider.get_stock_data(cleaned_stock_code, market_type)
+        # 获取含技术指标的股票数据 (清理代码、优先使用缓存并校验)
+        cleaned_stock_code, df = await analyzer.load_stock_df(stock_code, market_type)
         
-        # 检查是否有错误
-        if hasattr(df, 'error'):
-            raise HTTPException(status_code=400, detail=df.error)
+        # 非流式请求AI接口，一次返回完整分析结果
+        result = await analyzer.ai_analyzer.get_ai_analysis_result(df, stock_code, market_type)
         
-        # 检查数据是否为空
-        if df.empty:
-            raise HTTPException(status_code=404, detail=f"获取到的股票 {cleaned_stock_code} 数据为空")
-        
-        # 计算技术指标
-        df_with_indicators = analyzer.indicator.calculate_indicators(df)
-        
-        # 收集AI分析结果
-        full_ai_analysis_text = ""
-        analysis_score = None
-        analysis_recommendation = None
-
-        async for result_json_str in analyzer.ai_analyzer.get_ai_analysis(df_with_indicators, stock_code, market_type, stream=True):
-            try:
-                result = json.loads(result_json_str)
-                
-                if "ai_analysis_chunk" in result:
-                    full_ai_analysis_text += result["ai_analysis_chunk"]
-                
-                if result.get("status") == "completed":
-                    analysis_score = result.get("score")
-                    analysis_recommendation = result.get("recommendation")
-                    # Break after receiving the completed status, as all chunks should have been collected
-                    break 
-            except json.JSONDecodeError:
-                # This should ideally not happen if ai_analyzer.py always yields valid JSON
-                logger.error(f"Failed to decode JSON from AI analysis stream: {result_json_str}")
-                continue
-        
-        if full_ai_analysis_text or analysis_score is not None or analysis_recommendation is not None:
-            return {
+        if result.get("status") == "completed":
+            return _json_response({
                 "stock_code": stock_code,
                 "market_type": market_type,
-                "ai_analysis": full_ai_analysis_text,
-                "score": analysis_score,
-                "recommendation": analysis_recommendation
-            }
+                "ai_analysis": result.get("analysis", ""),
+                "score": result.get("score"),
+                "recommendation": result.get("recommendation")
+            })
         else:
             raise HTTPException(status_code=404, detail="未获取到AI分析结果")
     
@@ -512,5 +475,17 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
     
-    # 启动服务
-    uvicorn.run("main:app", host=host, port=port, reload=True)
+    # 开发环境(ENV=dev)启用自动重载，其余环境按WEB_CONCURRENCY启动多个工作进程（与reload互斥）
+    dev_mode = os.getenv("ENV") == "dev"
+    workers = 1 if dev_mode else int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    
+    # 启动服务 (loop/http为auto时，安装了uvicorn[standard]即使用uvloop和httptools，Windows下回退到asyncio)
+    uvicorn.run(
+        "main:app",
+        host=host,
+        port=port,
+        loop="auto",
+        http="auto",
+        reload=dev_mode,
+        workers=workers
+    )
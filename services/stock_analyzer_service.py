@@ -1,15 +1,33 @@
 import json
-from datetime import datetime
-from typing import List, AsyncGenerator
+import numpy as np
+import pandas as pd
+from typing import List, AsyncGenerator, Tuple
+from fastapi import HTTPException
 from utils.logger import get_logger
+from utils.date_utils import today_str
 from services.stock_data_provider import StockDataProvider
 from services.technical_indicator import TechnicalIndicator
 from services.stock_scorer import StockScorer
 from services.ai_analyzer import AIAnalyzer
+from services.stock_cache import StockDataCache
 
 # 获取日志器
 logger = get_logger()
 
+# A股代码可能携带的交易所前缀(sh/sz)字符码；字符码与0x20按位或即转为小写，无需生成新字符串
+_PREFIX_FIRST = ord('s')
+_PREFIX_SECOND = (ord('h'), ord('z'))
+
+def _clean_stock_code(stock_code: str, market_type: str) -> str:
+    """清理股票代码，仅对A股去除sh/sz前缀（不区分大小写）"""
+    if (market_type == 'A' and len(stock_code) >= 2
+            and ord(stock_code[0]) | 0x20 == _PREFIX_FIRST
+            and ord(stock_code[1]) | 0x20 in _PREFIX_SECOND):
+        cleaned_stock_code = stock_code[2:]
+        logger.debug(f"股票代码 {stock_code} 已清理为 {cleaned_stock_code}")
+        return cleaned_stock_code
+    return stock_code
+
 class StockAnalyzerService:
     """
     股票分析服务
@@ -36,9 +54,80 @@ class StockAnalyzerService:
             custom_api_model=custom_api_model,
             custom_api_timeout=custom_api_timeout
         )
+        self.cache = StockDataCache(self.data_provider, self.indicator)
         
         logger.info("初始化StockAnalyzerService完成")
     
+    async def aclose(self):
+        """释放各组件持有的连接池和线程池"""
+        await self.ai_analyzer.aclose()
+        self.data_provider.close()
+    
+    async def warmup(self):
+        """
+        预热各组件，避免每个工作进程的首个请求承担初始化开销
+        包括：用模拟数据跑一遍指标计算和评分、预先导入akshare、创建AI接口的HTTP客户端
+        预热失败只记录警告，不影响服务启动
+        """
+        try:
+            periods = 120
+            close = np.linspace(10.0, 12.0, periods)
+            df = pd.DataFrame({
+                'Open': close,
+                'High': close * 1.01,
+                'Low': close * 0.99,
+                'Close': close,
+                'Volume': np.full(periods, 1e6)
+            }, index=pd.date_range(end=today_str(), periods=periods, freq='D'))
+            df = self.indicator.calculate_indicators(df)
+            self.scorer.calculate_score(df)
+            self.ai_analyzer.open()
+        except Exception as e:
+            logger.warning(f"预热指标计算和AI客户端失败: {str(e)}")
+        
+        try:
+            await self.data_provider.warmup()
+        except Exception as e:
+            logger.warning(f"预先导入数据源模块失败: {str(e)}")
+        
+        logger.info("StockAnalyzerService预热完成")
+    
+    async def load_stock_df(self, stock_code: str, market_type: str = 'A') -> Tuple[str, pd.DataFrame]:
+        """
+        清理股票代码并获取含技术指标的股票数据（优先使用缓存）
+        
+        Args:
+            stock_code: 股票代码
+            market_type: 市场类型，默认为'A'股
+            
+        Returns:
+            (清理后的股票代码, 含技术指标的DataFrame)的元组
+            
+        Raises:
+            HTTPException: 获取数据出错(400)或数据为空(404)
+        """
+        cleaned_stock_code = _clean_stock_code(stock_code, market_type)
+        
+        try:
+            result = await self.cache.get_df_with_indicators(cleaned_stock_code, market_type)
+        except KeyError as ke:
+            logger.error(f"股票代码 {cleaned_stock_code} 在数据源中不存在或格式不正确: {str(ke)}")
+            raise HTTPException(status_code=400, detail=f"股票代码 {cleaned_stock_code} 在数据源中不存在或格式不正确")
+        
+        # 检查是否有错误
+        if result.error is not None:
+            logger.error(f"获取股票数据时出错: {result.error}")
+            raise HTTPException(status_code=400, detail=result.error)
+        
+        # 检查数据是否为空
+        df = result.df
+        if df.empty:
+            error_msg = f"获取到的股票 {cleaned_stock_code} 数据为空"
+            logger.error(error_msg)
+            raise HTTPException(status_code=404, detail=error_msg)
+        
+        return cleaned_stock_code, df
+    
     async def analyze_stock(self, stock_code: str, market_type: str = 'A', stream: bool = False) -> AsyncGenerator[str, None]:
         """
         分析单只股票
@@ -55,11 +144,11 @@ class StockAnalyzerService:
             logger.info(f"开始分析股票: {stock_code}, 市场: {market_type}")
             
             # 获取股票数据
-            df = await self.data_provider.get_stock_data(stock_code, market_type)
+            result = await self.data_provider.get_stock_data(stock_code, market_type)
             
             # 检查是否有错误
-            if hasattr(df, 'error'):
-                error_msg = df.error
+            if result.error is not None:
+                error_msg = result.error
                 logger.error(f"获取股票数据时出错: {error_msg}")
                 yield json.dumps({
                     "stock_code": stock_code,
@@ -70,6 +159,7 @@ class StockAnalyzerService:
                 return
             
             # 检查数据是否为空
+            df = result.df
             if df.empty:
                 error_msg = f"获取到的股票 {stock_code} 数据为空"
                 logger.error(error_msg)
@@ -137,7 +227,7 @@ class StockAnalyzerService:
                 volume_status = "NORMAL"
                 
             # 当前分析日期
-            analysis_date = datetime.now().strftime('%Y-%m-%d')
+            analysis_date = today_str()
             
             # 生成基本分析结果
             basic_result = {
@@ -163,7 +253,7 @@ class StockAnalyzerService:
             
             # 使用AI进行深入分析
             async for analysis_chunk in self.ai_analyzer.get_ai_analysis(df_with_indicators, stock_code, market_type, stream):
-                yield analysis_chunk
+                yield json.dumps(analysis_chunk)
                 
             logger.info(f"完成股票分析: {stock_code}")
             
@@ -202,9 +292,17 @@ class StockAnalyzerService:
             
             # 计算技术指标
             stock_with_indicators = {}
-            for code, df in stock_data_dict.items():
+            for code, result in stock_data_dict.items():
+                # 获取数据出错的股票直接发送错误状态
+                if result.error is not None:
+                    yield json.dumps({
+                        "stock_code": code,
+                        "error": result.error,
+                        "status": "error"
+                    })
+                    continue
                 try:
-                    stock_with_indicators[code] = self.indicator.calculate_indicators(df)
+                    stock_with_indicators[code] = self.indicator.calculate_indicators(result.df)
                 except Exception as e:
                     logger.error(f"计算 {code} 技术指标时出错: {str(e)}")
                     # 发送错误状态
@@ -266,7 +364,7 @@ class StockAnalyzerService:
                         
                         # AI分析
                         async for analysis_chunk in self.ai_analyzer.get_ai_analysis(df, stock_code, market_type, stream):
-                            yield analysis_chunk
+                            yield json.dumps(analysis_chunk)
             
             # 输出扫描完成信息
             yield json.dumps({
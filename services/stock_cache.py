@@ -0,0 +1,198 @@
+import os
+import time
+import asyncio
+import numpy as np
+import pandas as pd
+from utils.date_utils import today_str
+from typing import Dict, Any, Optional, Tuple
+from utils.logger import get_logger
+from services.stock_data_provider import DataResult
+
+# 获取日志器
+logger = get_logger()
+
+# 接口判定趋势/信号所需的列，最新两行按此顺序缓存为float数组
+LATEST_COLUMNS = (
+    'Close', 'Change_pct', 'MA5', 'MA20', 'MA60', 'RSI', 'MACD', 'Signal',
+    'Volume', 'Volume_MA', 'BB_Upper', 'BB_Middle', 'BB_Lower'
+)
+
+class StockDataCache:
+    """
+    股票数据缓存服务
+    按(股票代码, 市场类型, 交易日)缓存计算好技术指标的DataFrame，
+    避免各接口对同一只股票重复获取数据和计算指标
+    """
+
+    def __init__(self, data_provider, indicator, ttl: Optional[int] = None, maxsize: int = 4096):
+        """
+        初始化股票数据缓存服务
+
+        Args:
+            data_provider: 数据提供服务(StockDataProvider)
+            indicator: 技术指标计算服务(TechnicalIndicator)
+            ttl: 缓存有效期（秒），默认读取环境变量STOCK_CACHE_TTL，未设置时为300秒
+            maxsize: 最大缓存条目数
+        """
+        self.data_provider = data_provider
+        self.indicator = indicator
+        self.ttl = int(ttl if ttl is not None else os.getenv('STOCK_CACHE_TTL', 300))
+        self.maxsize = maxsize
+
+        # 缓存条目: {key: [过期时间戳, 含技术指标的DataFrame, 最新价格快照, 最新两行指标数组]}
+        self._entries: Dict[Tuple[str, str, str], list] = {}
+        # 正在获取数据的任务: {key: asyncio.Task}，同一key的并发请求共享同一次获取（single flight）
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Task] = {}
+
+        logger.debug(f"初始化StockDataCache: ttl={self.ttl}, maxsize={self.maxsize}")
+
+    def _make_key(self, stock_code: str, market_type: str) -> Tuple[str, str, str]:
+        """生成缓存键(股票代码, 市场类型, 交易日)"""
+        return (stock_code, market_type, today_str())
+
+    def _get_entry(self, key: Tuple[str, str, str]) -> Optional[list]:
+        """获取未过期的缓存条目"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            self._entries.pop(key, None)
+            return None
+        return entry
+
+    def _store(self, key: Tuple[str, str, str], df: pd.DataFrame) -> None:
+        """写入缓存条目，超出容量时先清理过期条目，再淘汰最早写入的条目"""
+        now = time.time()
+        if len(self._entries) >= self.maxsize:
+            for expired_key in [k for k, v in self._entries.items() if v[0] < now]:
+                del self._entries[expired_key]
+        while len(self._entries) >= self.maxsize:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = [now + self.ttl, df, None, None]
+
+    async def get_df_with_indicators(self, stock_code: str, market_type: str = 'A') -> DataResult:
+        """
+        获取含技术指标的股票数据，优先使用缓存
+        缓存未命中时，同一股票的并发请求只获取一次数据，结果（包括异常）由所有请求共享
+
+        Args:
+            stock_code: 股票代码（已清理前缀）
+            market_type: 市场类型，默认为'A'股
+
+        Returns:
+            数据获取结果，df为含技术指标的DataFrame；获取失败(error不为None)或数据为空时原样返回数据提供服务的结果，不缓存
+        """
+        key = self._make_key(stock_code, market_type)
+        entry = self._get_entry(key)
+        if entry is not None:
+            logger.debug(f"命中股票数据缓存: {key}")
+            return DataResult(entry[1])
+
+        task = self._inflight.get(key)
+        if task is None:
+            # 获取数据放在独立任务中执行，发起请求的客户端断开时不会中断其他等待者共享的获取
+            task = asyncio.create_task(self._load(stock_code, market_type, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish_inflight(key, done))
+        else:
+            logger.debug(f"等待进行中的股票数据获取: {key}")
+
+        # shield: 单个等待者被取消时不取消共享任务；任务的结果或异常由所有等待者共享
+        return await asyncio.shield(task)
+
+    async def _load(self, stock_code: str, market_type: str, key: Tuple[str, str, str]) -> DataResult:
+        """获取股票数据并计算技术指标，成功时写入缓存"""
+        result = await self.data_provider.get_stock_data(stock_code, market_type)
+
+        # 错误或空数据不缓存，交由调用方处理
+        if result.error is not None or result.df.empty:
+            return result
+
+        df_with_indicators = self.indicator.calculate_indicators(result.df)
+        self._store(key, df_with_indicators)
+        return DataResult(df_with_indicators)
+
+    def _finish_inflight(self, key: Tuple[str, str, str], task: asyncio.Task) -> None:
+        """任务结束后移出进行中列表；所有等待者都已取消时，取出异常避免"未获取异常"警告"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def get_latest_snapshot(self, stock_code: str, market_type: str, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        获取最新价格快照，与DataFrame一同缓存，重复请求无需再索引DataFrame
+
+        Args:
+            stock_code: 股票代码（已清理前缀）
+            market_type: 市场类型
+            df: get_df_with_indicators返回的DataFrame
+
+        Returns:
+            最新价格信息字典
+        """
+        entry = self._get_entry(self._make_key(stock_code, market_type))
+        if entry is not None and entry[1] is df and entry[2] is not None:
+            return entry[2]
+
+        snapshot = self._build_snapshot(df)
+        if entry is not None and entry[1] is df:
+            entry[2] = snapshot
+        return snapshot
+
+    def get_latest_rows(self, stock_code: str, market_type: str, df: pd.DataFrame) -> np.ndarray:
+        """
+        获取最新两行指标数组，与DataFrame一同缓存，重复请求无需再索引DataFrame
+
+        Args:
+            stock_code: 股票代码（已清理前缀）
+            market_type: 市场类型
+            df: get_df_with_indicators返回的DataFrame
+
+        Returns:
+            形状为(2, len(LATEST_COLUMNS))的float数组，第0行为前一交易日，第1行为最新交易日；
+            只有一条数据时两行相同，缺失的列为NaN
+        """
+        entry = self._get_entry(self._make_key(stock_code, market_type))
+        if entry is not None and entry[1] is df and entry[3] is not None:
+            return entry[3]
+
+        rows = self._build_latest_rows(df)
+        if entry is not None and entry[1] is df:
+            entry[3] = rows
+        return rows
+
+    def _build_latest_rows(self, df: pd.DataFrame) -> np.ndarray:
+        """按LATEST_COLUMNS取出最新两行数据"""
+        tail = df.iloc[-2:] if len(df) > 1 else df.iloc[[-1, -1]]
+        rows = np.full((2, len(LATEST_COLUMNS)), np.nan)
+        for i, column in enumerate(LATEST_COLUMNS):
+            if column in tail.columns:
+                rows[:, i] = tail[column].to_numpy(dtype=np.float64)
+        return rows
+
+    def _build_snapshot(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """根据最新两条数据生成价格快照"""
+        latest_data = df.iloc[-1]
+        previous_data = df.iloc[-2] if len(df) > 1 else latest_data
+
+        # 价格变动绝对值
+        price_change_value = latest_data['Close'] - previous_data['Close']
+
+        # 获取涨跌幅
+        change_percent = latest_data.get('Change_pct')
+
+        # 如果原始数据中没有涨跌幅，才进行计算
+        if change_percent is None and previous_data['Close'] != 0:
+            change_percent = (price_change_value / previous_data['Close']) * 100
+
+        return {
+            "price": float(latest_data['Close']),
+            "open": float(latest_data['Open']),
+            "high": float(latest_data['High']),
+            "low": float(latest_data['Low']),
+            "volume": float(latest_data['Volume']),
+            "price_change_value": float(price_change_value),
+            "change_percent": float(change_percent) if change_percent is not None else None,
+            "date": latest_data.name.strftime('%Y-%m-%d')
+        }
@@ -1,25 +1,55 @@
+import os
+import importlib
 import pandas as pd
 from datetime import datetime, timedelta
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple, Any
 from utils.logger import get_logger
 
 # 获取日志器
 logger = get_logger()
 
+@dataclass
+class DataResult:
+    """
+    数据获取结果
+    获取成功时error为None；失败时df为空DataFrame，error为错误信息
+    """
+    df: pd.DataFrame
+    error: Optional[str] = None
+
 class StockDataProvider:
     """
     异步股票数据提供服务
     负责获取股票、基金等金融产品的历史数据
     """
     
-    def __init__(self):
-        """初始化数据提供者服务"""
-        logger.debug("初始化StockDataProvider")
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        初始化数据提供者服务
+        
+        Args:
+            max_workers: 执行同步akshare调用的线程数，默认读取环境变量DATA_PROVIDER_WORKERS，未设置时为16
+        """
+        # 专用线程池，避免与FastAPI默认线程池争用，并按上游数据源的并发能力设置大小
+        self.max_workers = int(max_workers or os.getenv('DATA_PROVIDER_WORKERS', 16))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stock-data")
+        logger.debug(f"初始化StockDataProvider, 线程数: {self.max_workers}")
+    
+    def close(self):
+        """关闭专用线程池"""
+        self._executor.shutdown(wait=False)
+    
+    async def warmup(self):
+        """在专用线程池中预先导入akshare，避免首个请求承担其导入开销"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, importlib.import_module, 'akshare')
     
     async def get_stock_data(self, stock_code: str, market_type: str = 'A', 
                             start_date: Optional[str] = None, 
-                            end_date: Optional[str] = None) -> pd.DataFrame:
+                            end_date: Optional[str] = None) -> DataResult:
         """
         异步获取股票或基金数据
         
@@ -30,10 +60,12 @@ class StockDataProvider:
             end_date: 结束日期，格式YYYYMMDD，默认为今天
             
         Returns:
-            包含历史数据的DataFrame
+            数据获取结果，df为包含历史数据的DataFrame；获取失败时error为错误信息
         """
-        # 使用线程池执行同步的akshare调用
-        return await asyncio.to_thread(
+        # 使用专用线程池执行同步的akshare调用
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
             self._get_stock_data_sync, 
             stock_code, 
             market_type, 
@@ -43,7 +75,7 @@ class StockDataProvider:
     
     def _get_stock_data_sync(self, stock_code: str, market_type: str = 'A', 
                            start_date: Optional[str] = None, 
-                           end_date: Optional[str] = None) -> pd.DataFrame:
+                           end_date: Optional[str] = None) -> DataResult:
         """
         同步获取股票数据的实现
         将被异步方法调用
@@ -248,23 +280,21 @@ class StockDataProvider:
             df.sort_index(inplace=True)
                 
             logger.info(f"成功获取{market_type}数据 {stock_code}, 数据点数: {len(df)}")
-            return df
+            return DataResult(df)
             
         except Exception as e:
             error_msg = f"获取{market_type}数据失败 {stock_code}: {str(e)}"
             logger.error(error_msg)
             logger.exception(e)
-            # 使用空的DataFrame并添加错误信息，而不是抛出异常
+            # 返回空的DataFrame和错误信息，而不是抛出异常
             # 这样上层调用者可以检查是否有错误并适当处理
-            df = pd.DataFrame()
-            df.error = error_msg  # 添加错误属性
-            return df
+            return DataResult(pd.DataFrame(), error_msg)
             
     async def get_multiple_stocks_data(self, stock_codes: List[str], 
                                      market_type: str = 'A',
                                      start_date: Optional[str] = None, 
                                      end_date: Optional[str] = None,
-                                     max_concurrency: int = 5) -> Dict[str, pd.DataFrame]:
+                                     max_concurrency: int = 5) -> Dict[str, DataResult]:
         """
         异步批量获取多只股票数据
         
@@ -276,7 +306,7 @@ class StockDataProvider:
             max_concurrency: 最大并发数，默认为5
             
         Returns:
-            字典，键为股票代码，值为对应的DataFrame
+            字典，键为股票代码，值为对应的数据获取结果
         """
         # 使用信号量控制并发数
         semaphore = asyncio.Semaphore(max_concurrency)
@@ -296,4 +326,4 @@ class StockDataProvider:
         results = await asyncio.gather(*tasks)
         
         # 构建结果字典，过滤掉失败的请求
-        return {code: df for code, df in results if df is not None}
\ No newline at end of file
+        return {code: result for code, result in results if result is not None}
\ No newline at end of file
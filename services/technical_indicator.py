@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from typing import Dict, Optional, Any
 from utils.logger import get_logger
@@ -5,6 +6,126 @@ from utils.logger import get_logger
 # 获取日志器
 logger = get_logger()
 
+# numba为可选依赖，安装后使用JIT编译的指标计算内核，否则使用NumPy/pandas向量化实现
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    # 内核依赖NaN判断输出预热期，因此不启用fastmath
+    @njit(cache=True, nogil=True)
+    def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+        """滑动均值：维护窗口累加和，O(n)；窗口内含NaN时输出NaN（与pandas rolling一致）"""
+        n = values.shape[0]
+        out = np.full(n, np.nan)
+        total = 0.0
+        nan_count = 0
+        for i in range(n):
+            value = values[i]
+            if np.isnan(value):
+                nan_count += 1
+            else:
+                total += value
+            if i >= window:
+                dropped = values[i - window]
+                if np.isnan(dropped):
+                    nan_count -= 1
+                else:
+                    total -= dropped
+            if i >= window - 1 and nan_count == 0:
+                out[i] = total / window
+        return out
+
+    @njit(cache=True, nogil=True)
+    def _rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+        """滑动样本标准差(ddof=1)：逐窗口两遍计算，避免累加平方和的精度损失"""
+        n = values.shape[0]
+        out = np.full(n, np.nan)
+        if window < 2:
+            return out
+        for i in range(window - 1, n):
+            mean = 0.0
+            for j in range(i - window + 1, i + 1):
+                mean += values[j]
+            mean /= window
+            sq_sum = 0.0
+            for j in range(i - window + 1, i + 1):
+                sq_sum += (values[j] - mean) ** 2
+            out[i] = np.sqrt(sq_sum / (window - 1))
+        return out
+
+    @njit(cache=True, nogil=True)
+    def _ema(values: np.ndarray, span: int) -> np.ndarray:
+        """指数移动平均，等价于pandas ewm(span=span, adjust=False).mean()"""
+        n = values.shape[0]
+        out = np.full(n, np.nan)
+        alpha = 2.0 / (span + 1.0)
+        weighted = np.nan
+        # 距上一个有效值的步数，用于处理中间缺失值
+        gap = 0
+        for i in range(n):
+            value = values[i]
+            if np.isnan(weighted):
+                if not np.isnan(value):
+                    weighted = value
+                    gap = 0
+            elif not np.isnan(value):
+                old_wt = (1.0 - alpha) ** (gap + 1)
+                weighted = (old_wt * weighted + alpha * value) / (old_wt + alpha)
+                gap = 0
+            else:
+                gap += 1
+            out[i] = weighted
+        return out
+
+    # 导入时预编译内核，避免首个请求承担JIT编译开销
+    _warmup = np.arange(8, dtype=np.float64)
+    _rolling_mean(_warmup, 3)
+    _rolling_std(_warmup, 3)
+    _ema(_warmup, 3)
+    del _warmup
+else:
+    def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+        """滑动均值（NumPy滑动窗口视图实现）"""
+        out = np.full(values.shape[0], np.nan)
+        if values.shape[0] >= window:
+            out[window - 1:] = np.lib.stride_tricks.sliding_window_view(values, window).mean(axis=1)
+        return out
+
+    def _rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+        """滑动样本标准差(ddof=1)（NumPy滑动窗口视图实现）"""
+        out = np.full(values.shape[0], np.nan)
+        if window >= 2 and values.shape[0] >= window:
+            out[window - 1:] = np.lib.stride_tricks.sliding_window_view(values, window).std(axis=1, ddof=1)
+        return out
+
+    def _ema(values: np.ndarray, span: int) -> np.ndarray:
+        """指数移动平均（pandas实现）"""
+        return pd.Series(values).ewm(span=span, adjust=False).mean().to_numpy()
+
+def _rsi(close: np.ndarray, period: int) -> np.ndarray:
+    """RSI（涨跌幅简单滑动平均）"""
+    delta = np.empty_like(close)
+    delta[0] = np.nan
+    delta[1:] = close[1:] - close[:-1]
+    # NaN比较结果为False，与pandas where的处理一致，首个差值按0计入
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = _rolling_mean(gain, period) / _rolling_mean(loss, period)
+        return 100 - (100 / (1 + rs))
+
+def _atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int) -> np.ndarray:
+    """ATR（真实波幅简单滑动平均）"""
+    prev_close = np.empty_like(close)
+    prev_close[0] = np.nan
+    prev_close[1:] = close[:-1]
+    # fmax忽略NaN，与pandas max(axis=1)跳过缺失值一致
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return _rolling_mean(tr, period)
+
 class TechnicalIndicator:
     """
     技术指标计算服务
@@ -41,7 +162,7 @@ class TechnicalIndicator:
         Returns:
             EMA序列
         """
-        return series.ewm(span=period, adjust=False).mean()
+        return pd.Series(_ema(series.to_numpy(dtype=np.float64), period), index=series.index)
     
     def calculate_rsi(self, series: pd.Series, period: int) -> pd.Series:
         """
@@ -54,17 +175,7 @@ class TechnicalIndicator:
         Returns:
             RSI序列
         """
-        delta = series.diff()
-        gain = delta.where(delta > 0, 0)
-        loss = -delta.where(delta < 0, 0)
-        
-        avg_gain = gain.rolling(window=period).mean()
-        avg_loss = loss.rolling(window=period).mean()
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi
+        return pd.Series(_rsi(series.to_numpy(dtype=np.float64), period), index=series.index)
     
     def calculate_macd(self, series: pd.Series) -> tuple:
         """
@@ -97,11 +208,13 @@ class TechnicalIndicator:
         Returns:
             (中轨, 上轨, 下轨)的元组
         """
-        middle = series.rolling(window=period).mean()
-        std = series.rolling(window=period).std()
+        values = series.to_numpy(dtype=np.float64)
+        middle = _rolling_mean(values, period)
+        std = _rolling_std(values, period)
         
-        upper = middle + std_dev * std
-        lower = middle - std_dev * std
+        upper = pd.Series(middle + std_dev * std, index=series.index)
+        lower = pd.Series(middle - std_dev * std, index=series.index)
+        middle = pd.Series(middle, index=series.index)
         
         return middle, upper, lower
     
@@ -116,18 +229,13 @@ class TechnicalIndicator:
         Returns:
             ATR序列
         """
-        high = df['High']
-        low = df['Low']
-        close = df['Close']
-        
-        tr1 = high - low
-        tr2 = abs(high - close.shift())
-        tr3 = abs(low - close.shift())
-        
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        atr = tr.rolling(window=period).mean()
-        
-        return atr
+        atr = _atr(
+            df['High'].to_numpy(dtype=np.float64),
+            df['Low'].to_numpy(dtype=np.float64),
+            df['Close'].to_numpy(dtype=np.float64),
+            period
+        )
+        return pd.Series(atr, index=df.index)
     
     def calculate_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -140,45 +248,54 @@ class TechnicalIndicator:
             添加了技术指标的DataFrame
         """
         try:
-            # 复制数据框
-            result_df = df.copy()
+            # 一次性取出NumPy数组，指标均在数组上计算，先收集到字典中
+            close = df['Close'].to_numpy(dtype=np.float64)
+            volume = df['Volume'].to_numpy(dtype=np.float64)
+            indicators = {}
             
             # 移动平均线
             for name, period in self.params['ma_periods'].items():
-                result_df[f'MA{period}'] = result_df['Close'].rolling(window=period).mean()
+                indicators[f'MA{period}'] = _rolling_mean(close, period)
             
             # RSI
-            result_df['RSI'] = self.calculate_rsi(result_df['Close'], self.params['rsi_period'])
+            indicators['RSI'] = _rsi(close, self.params['rsi_period'])
             
             # MACD
-            macd, signal, histogram = self.calculate_macd(result_df['Close'])
-            result_df['MACD'] = macd
-            result_df['Signal'] = signal
-            result_df['Histogram'] = histogram
+            macd = _ema(close, 12) - _ema(close, 26)
+            signal = _ema(macd, 9)
+            indicators['MACD'] = macd
+            indicators['Signal'] = signal
+            indicators['Histogram'] = macd - signal
             
             # 布林带
-            middle, upper, lower = self.calculate_bollinger_bands(
-                result_df['Close'], 
-                self.params['bollinger_period'], 
-                self.params['bollinger_std']
-            )
-            result_df['BB_Middle'] = middle
-            result_df['BB_Upper'] = upper
-            result_df['BB_Lower'] = lower
+            bollinger_period = self.params['bollinger_period']
+            middle = _rolling_mean(close, bollinger_period)
+            std = _rolling_std(close, bollinger_period)
+            indicators['BB_Middle'] = middle
+            indicators['BB_Upper'] = middle + self.params['bollinger_std'] * std
+            indicators['BB_Lower'] = middle - self.params['bollinger_std'] * std
             
             # 成交量移动平均
-            result_df['Volume_MA'] = result_df['Volume'].rolling(window=self.params['volume_ma_period']).mean()
+            volume_ma = _rolling_mean(volume, self.params['volume_ma_period'])
+            indicators['Volume_MA'] = volume_ma
             
             # 成交量比率
-            result_df['Volume_Ratio'] = result_df['Volume'] / result_df['Volume_MA']
+            with np.errstate(divide='ignore', invalid='ignore'):
+                indicators['Volume_Ratio'] = volume / volume_ma
             
             # ATR
-            result_df['ATR'] = self.calculate_atr(result_df, self.params['atr_period'])
+            indicators['ATR'] = _atr(
+                df['High'].to_numpy(dtype=np.float64),
+                df['Low'].to_numpy(dtype=np.float64),
+                close,
+                self.params['atr_period']
+            )
             
             # 波动率 (过去20天收盘价的标准差/均值)
-            result_df['Volatility'] = result_df['Close'].rolling(window=20).std() / result_df['Close'].rolling(window=20).mean() * 100
+            indicators['Volatility'] = _rolling_std(close, 20) / _rolling_mean(close, 20) * 100
             
-            return result_df
+            # 指标列一次性拼接到原始数据后，避免逐列赋值带来的重复内部块整理
+            return pd.concat([df, pd.DataFrame(indicators, index=df.index)], axis=1)
             
         except Exception as e:
             logger.error(f"计算技术指标时出错: {str(e)}")
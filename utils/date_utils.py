@@ -0,0 +1,17 @@
+import time
+from datetime import datetime
+
+# 当日日期字符串缓存: [epoch分钟数, 'YYYY-MM-DD']，每分钟最多格式化一次
+_TODAY_CACHE = [0, ""]
+
+def today_str() -> str:
+    """
+    获取当天日期字符串
+
+    Returns:
+        格式为'%Y-%m-%d'的当天日期，同一分钟内直接返回缓存结果
+    """
+    minute = int(time.time()) // 60
+    if minute != _TODAY_CACHE[0]:
+        _TODAY_CACHE[:] = [minute, datetime.now().strftime('%Y-%m-%d')]
+    return _TODAY_CACHE[1]